@@ -1,23 +1,36 @@
 import os
 import re
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file
+import threading
+from flask import (
+    Flask, render_template, request, redirect, url_for, flash, send_file, abort, jsonify
+)
 from flask_login import (
     LoginManager, UserMixin, login_user, logout_user, login_required
 )
 from datetime import datetime
 from collections import defaultdict
+from markupsafe import Markup
 
 from database import (
-    create_db_if_not_exists, get_or_create_bin, get_bin_info, get_bin_weight,
+    create_db_if_not_exists, get_or_create_bin, get_bin_info, get_bin_weight, get_article,
     update_bin_weight, list_articles_in_bin, add_article, remove_article, edit_article,
     update_bin_image, remove_bin_image, search_db, export_excel_xlsx,
-    get_group_weight, get_total_articles, get_metrics, get_top_5_in, get_top_5_out,
-    get_movements_in_date_range, get_articles_in_multiple_bins, get_movements_by_article_in_range
+    get_group_weight, get_inventory_at, reconcile_ledger, get_zone_versions
 )
+from panels import PANELS, PANEL_STATS, get_panel, get_all_panels
+from assets import init_assets
+from compression import CompressionMiddleware
 
 app=Flask(__name__)
 app.secret_key="UN_SECRET_KEY_A_CHANGER"
 
+# Schéma créé / migré une fois au chargement (aussi sous waitress-serve app:app)
+create_db_if_not_exists()
+
+# Bootstrap / Chart.js servis localement (réseau entrepôt souvent hors ligne)
+init_assets(app)
+app.wsgi_app=CompressionMiddleware(app.wsgi_app)
+
 login_manager=LoginManager()
 login_manager.init_app(app)
 login_manager.login_view="login"
@@ -36,6 +49,20 @@ def load_user(user_id):
         return User(1,VALID_USERNAME)
     return None
 
+@app.after_request
+def conditional_html(response):
+    """
+    ETag sur les pages HTML : un rechargement identique => 304 sans corps.
+    Vary posé ici (et non seulement par CompressionMiddleware) pour que
+    le 304 garde les mêmes en-têtes que le 200.
+    """
+    if request.method=="GET" and response.status_code==200 and response.mimetype=="text/html":
+        response.headers["Cache-Control"]="private, no-cache"
+        response.vary.add("Accept-Encoding")
+        response.add_etag(weak=True)
+        response.make_conditional(request)
+    return response
+
 # Ordre E..D..C..B..A
 LETTERS_ORDER=["E","D","C","B","A"]
 
@@ -61,38 +88,86 @@ def logout():
     flash("Déconnecté.","info")
     return redirect(url_for("login"))
 
+# Cache HTML par zone : {lettre: (version, html)}
+ZONE_FRAGMENTS={}
+FRAGMENT_STATS={"hits":0,"misses":0}
+fragments_lock=threading.Lock()
+
+def build_zone_data(letter):
+    row_bins=[]
+    for num in range(1,9):
+        bn=f"{letter}{num}"
+        w=get_bin_weight(bn)
+        ratio_percent=min((w/500)*100,100)
+        row_bins.append({
+            "bin_name":bn,
+            "weight":w,
+            "ratio_percent":ratio_percent
+        })
+    g1_w=get_group_weight(letter,1)
+    g1_p=min((g1_w/2000)*100,100)
+    g2_w=get_group_weight(letter,2)
+    g2_p=min((g2_w/2000)*100,100)
+
+    return {
+        "letter":letter,
+        "bins":row_bins,
+        "group1":{"weight":g1_w,"ratio_percent":g1_p},
+        "group2":{"weight":g2_w,"ratio_percent":g2_p}
+    }
+
+def render_zone(letter, version):
+    """
+    HTML d'une zone, re-rendu seulement si sa version a changé
+    (update_bin_weight / add_article / remove_article).
+    """
+    cached=ZONE_FRAGMENTS.get(letter)
+    if cached and cached[0]==version:
+        with fragments_lock:
+            FRAGMENT_STATS["hits"]+=1
+        return cached[1]
+
+    html=Markup(render_template("zone_fragment.html", line=build_zone_data(letter)))
+    with fragments_lock:
+        FRAGMENT_STATS["misses"]+=1
+        ZONE_FRAGMENTS[letter]=(version,html)
+    return html
+
 @app.route("/")
 @login_required
 def index():
     """
     Page d'accueil : E..D..C..B..A, 8 bins par zone.
     Responsive (Bootstrap), on affiche tout sur une page.
+    Chaque zone est un fragment HTML en cache, clé = version de la zone.
     """
-    lines_data=[]
-    for letter in LETTERS_ORDER:
-        row_bins=[]
-        for num in range(1,9):
-            bn=f"{letter}{num}"
-            w=get_bin_weight(bn)
-            ratio_percent=min((w/500)*100,100)
-            row_bins.append({
-                "bin_name":bn,
-                "weight":w,
-                "ratio_percent":ratio_percent
-            })
-        g1_w=get_group_weight(letter,1)
-        g1_p=min((g1_w/2000)*100,100)
-        g2_w=get_group_weight(letter,2)
-        g2_p=min((g2_w/2000)*100,100)
-
-        lines_data.append({
-            "letter":letter,
-            "bins":row_bins,
-            "group1":{"weight":g1_w,"ratio_percent":g1_p},
-            "group2":{"weight":g2_w,"ratio_percent":g2_p}
-        })
+    versions=get_zone_versions()
+    zones_html=[render_zone(letter, versions.get(letter,0)) for letter in LETTERS_ORDER]
+    return render_template("index.html", zones_html=zones_html)
 
-    return render_template("index.html", lines_data=lines_data)
+@app.route("/stats/fragments")
+@login_required
+def fragment_stats():
+    with fragments_lock:
+        hits,misses=FRAGMENT_STATS["hits"],FRAGMENT_STATS["misses"]
+    total=hits+misses
+    return {
+        "hits":hits,
+        "misses":misses,
+        "hit_rate":round(hits/total,3) if total else 0.0,
+        "cached_zones":sorted(ZONE_FRAGMENTS.keys())
+    }
+
+@app.route("/stats/panels")
+@login_required
+def panel_stats():
+    hits,misses=PANEL_STATS["hits"],PANEL_STATS["misses"]
+    total=hits+misses
+    return {
+        "hits":hits,
+        "misses":misses,
+        "hit_rate":round(hits/total,3) if total else 0.0
+    }
 
 @app.route("/search")
 @login_required
@@ -111,7 +186,6 @@ def search():
             flash("Aucun article trouvé.","info")
             return redirect(url_for("index"))
         # Grouper par code => bins
-        from database import get_bin_info
         code_bins=defaultdict(set)
         for (aid,bid,code,ref,log) in articles:
             binfo=get_bin_info(bid)
@@ -226,12 +300,7 @@ def remove_article_route(article_id):
 @app.route("/article/<int:article_id>/edit", methods=["GET","POST"])
 @login_required
 def edit_article_route(article_id):
-    from database import get_db_connection, get_bin_info
-    conn=get_db_connection()
-    c=conn.cursor()
-    c.execute("SELECT bin_id, code, reference, login, quantity FROM Articles WHERE id=?", (article_id,))
-    row=c.fetchone()
-    conn.close()
+    row=get_article(article_id)
     if not row:
         flash("Article introuvable.","danger")
         return redirect(url_for("index"))
@@ -319,45 +388,85 @@ def bin_full_image(bin_name):
 @app.route("/dashboard", methods=["GET","POST"])
 @login_required
 def dashboard():
-    total_articles=get_total_articles()
-    articles_in,articles_out=get_metrics()
-    top5_in_list=get_top_5_in()
-    top5_out_list=get_top_5_out()
-
+    """
+    Squelette du dashboard : les panneaux sont chargés en parallèle
+    par le navigateur depuis /dashboard/panel/<nom>.
+    """
     def_start=datetime.now().strftime("%Y-%m-%d")
     def_end=def_start
-    start_date=request.form.get("start_date", def_start)
-    end_date=request.form.get("end_date", def_end)
+    start_date=request.values.get("start_date", def_start).strip()
+    end_date=request.values.get("end_date", def_end).strip()
+    if not valid_dashboard_dates(start_date, end_date):
+        flash("Date invalide (format AAAA-MM-JJ attendu).","danger")
+        start_date,end_date=def_start,def_end
 
-    moves=get_movements_in_date_range(start_date,end_date)
-    flux_by_day={}
-    for mv in moves:
-        # mv = (id, article_id, bin_id, action, qty_change, date_time)
-        dt=mv[5][:10]
-        flux_by_day[dt]=flux_by_day.get(dt,0)+1
-    sorted_days=sorted(flux_by_day.keys())
-    chart_labels=sorted_days
-    chart_values=[flux_by_day[d] for d in sorted_days]
+    return render_template("dashboard.html",
+                           start_date=start_date,
+                           end_date=end_date)
 
-    usage_list=get_movements_by_article_in_range(start_date,end_date)
-    usage_labels=[u[0] for u in usage_list]
-    usage_values=[u[1] for u in usage_list]
+def valid_dashboard_dates(*dates):
+    """
+    Chaque date est vide (borne ouverte, comme avant) ou au format YYYY-MM-DD.
+    """
+    for d in dates:
+        if not d:
+            continue
+        try:
+            datetime.strptime(d, "%Y-%m-%d")
+        except ValueError:
+            return False
+    return True
 
-    duplicates=get_articles_in_multiple_bins()
+def dashboard_dates():
+    """
+    (start_date, end_date) validées, sinon 400
+    (ces valeurs servent de clé au cache des panneaux).
+    """
+    today=datetime.now().strftime("%Y-%m-%d")
+    dates=(request.args.get("start_date", today).strip(), request.args.get("end_date", today).strip())
+    if not valid_dashboard_dates(*dates):
+        abort(400)
+    return dates
 
-    return render_template("dashboard.html",
-                           total_articles=total_articles,
-                           articles_in=articles_in,
-                           articles_out=articles_out,
-                           top5_in_list=top5_in_list,
-                           top5_out_list=top5_out_list,
-                           start_date=start_date,
-                           end_date=end_date,
-                           chart_labels=chart_labels,
-                           chart_values=chart_values,
-                           usage_labels=usage_labels,
-                           usage_values=usage_values,
-                           duplicates=duplicates)
+@app.route("/dashboard/panel/<name>")
+@login_required
+def dashboard_panel(name):
+    if name not in PANELS:
+        abort(404)
+    if PANELS[name][1]:
+        start_date,end_date=dashboard_dates()
+    else:
+        # panneau indépendant de la période : les dates sont ignorées
+        start_date,end_date=None,None
+    return jsonify(get_panel(name, start_date, end_date))
+
+@app.route("/dashboard/panels")
+@login_required
+def dashboard_panels():
+    start_date,end_date=dashboard_dates()
+    return jsonify(get_all_panels(start_date, end_date))
+
+@app.route("/history")
+@login_required
+def history():
+    """
+    Voyage dans le temps : contenu d'un bin (ou de tout le palettier)
+    à une date donnée, reconstruit depuis le journal des mouvements.
+    """
+    at=request.args.get("at","").strip() or datetime.now().strftime("%Y-%m-%dT%H:%M")
+    bin_name=request.args.get("bin","").strip().upper()
+    try:
+        inventory=get_inventory_at(at, bin_name or None)
+    except ValueError:
+        flash("Date invalide.","danger")
+        return redirect(url_for("history"))
+
+    issues=reconcile_ledger() if request.args.get("check") else None
+    return render_template("history.html",
+                           at=at,
+                           bin_name=bin_name,
+                           inventory=inventory,
+                           issues=issues)
 
 @app.route("/export_excel")
 @login_required
@@ -366,5 +475,4 @@ def export_excel():
     return send_file(path, as_attachment=True)
 
 if __name__=="__main__":
-    create_db_if_not_exists()
     app.run(debug=True, host="0.0.0.0", port=5000)
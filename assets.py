@@ -0,0 +1,51 @@
+import os
+import hashlib
+from flask import abort, current_app, send_from_directory, url_for
+
+# Librairies front (Bootstrap, Chart.js) copiées dans static/vendor,
+# servies sous /assets/<nom>.<hash>.<ext> => cache navigateur "immutable".
+VENDOR_DIR = "vendor"
+ASSET_EXTENSIONS = (".css", ".js")
+ONE_YEAR = 365*24*3600
+
+# {"bootstrap.min.css": "bootstrap.min.1a2b3c4d5e6f.css"} et l'inverse
+MANIFEST = {}
+HASHED_FILES = {}
+
+def build_manifest(vendor_path):
+    """
+    Calcule le hash (sha256, 12 car.) de chaque fichier de static/vendor.
+    """
+    MANIFEST.clear()
+    HASHED_FILES.clear()
+    for name in sorted(os.listdir(vendor_path)):
+        if not name.endswith(ASSET_EXTENSIONS):
+            continue
+        with open(os.path.join(vendor_path, name), "rb") as f:
+            digest=hashlib.sha256(f.read()).hexdigest()[:12]
+        stem,ext=os.path.splitext(name)
+        hashed=f"{stem}.{digest}{ext}"
+        MANIFEST[name]=hashed
+        HASHED_FILES[hashed]=name
+
+def asset_url(name):
+    """
+    URL avec empreinte pour un fichier de static/vendor (utilisable dans Jinja).
+    """
+    hashed=MANIFEST.get(name)
+    if not hashed:
+        return url_for("static", filename=f"{VENDOR_DIR}/{name}")
+    return url_for("asset", filename=hashed)
+
+def serve_asset(filename):
+    name=HASHED_FILES.get(filename)
+    if not name:
+        abort(404)
+    resp=send_from_directory(os.path.join(current_app.static_folder, VENDOR_DIR), name, max_age=ONE_YEAR)
+    resp.headers["Cache-Control"]=f"public, max-age={ONE_YEAR}, immutable"
+    return resp
+
+def init_assets(app):
+    build_manifest(os.path.join(app.static_folder, VENDOR_DIR))
+    app.add_url_rule("/assets/<filename>", "asset", serve_asset)
+    app.jinja_env.globals["asset_url"]=asset_url
@@ -0,0 +1,56 @@
+"""
+Benchmark de démarrage à froid : pour chaque essai, un interpréteur neuf
+(dans un dossier temporaire, base vide) mesure
+
+  - le temps d'import de app (création de l'app + migrations du schéma) ;
+  - le temps jusqu'à la première réponse (GET /login via le client de test) ;
+  - si openpyxl a été chargé au démarrage (il ne doit l'être que pour l'export).
+
+Usage : python benchmarks/cold_start.py [--runs 5]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+PROBE = """
+import json, sys, time
+t0=time.perf_counter()
+import app
+t1=time.perf_counter()
+resp=app.app.test_client().get("/login")
+t2=time.perf_counter()
+print(json.dumps({
+    "import_ms":(t1-t0)*1000,
+    "first_response_ms":(t2-t0)*1000,
+    "status":resp.status_code,
+    "openpyxl_loaded":"openpyxl" in sys.modules,
+}))
+"""
+
+def run_once():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env=dict(os.environ, PYTHONPATH=os.path.abspath(ROOT), PYTHONDONTWRITEBYTECODE="1")
+        out=subprocess.run([sys.executable, "-c", PROBE], cwd=tmpdir, env=env,
+                           capture_output=True, text=True, check=True)
+        return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args=parser.parse_args()
+
+    results=[run_once() for _ in range(args.runs)]
+    import_ms=statistics.median(r["import_ms"] for r in results)
+    first_ms=statistics.median(r["first_response_ms"] for r in results)
+    print(f"import app           : {import_ms:.1f} ms (médiane sur {args.runs})")
+    print(f"première réponse     : {first_ms:.1f} ms (statut {results[0]['status']})")
+    print(f"openpyxl au démarrage: {'oui' if any(r['openpyxl_loaded'] for r in results) else 'non'}")
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark de contention en écriture : N threads écrivains simultanés
+(ajout / modification / suppression d'articles), comparant
+
+  - "direct" : une connexion + transaction différée par mutation
+    (comportement historique, maj de Metrics à chaque écriture) ;
+  - "queue"  : le thread écrivain de database.WRITER (lots BEGIN IMMEDIATE,
+    une seule maj de Metrics par lot).
+
+Les deux bases sont en mode WAL, pour isoler l'effet du regroupement.
+
+Usage : python benchmarks/write_contention.py [--writers 32] [--iterations 50]
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import database
+
+BINS = [f"{letter}{num}" for letter in "EDCBA" for num in range(1,9)]
+
+def direct_submit(fn, *args):
+    conn=database.get_db_connection()
+    try:
+        c=conn.cursor()
+        counters=defaultdict(int)
+        result=fn(c, counters, *args)
+        if counters:
+            database.flush_metrics(c, counters)
+        conn.commit()
+        return result
+    finally:
+        conn.close()
+
+def queue_submit(fn, *args):
+    return database.WRITER.submit(fn, *args)
+
+def run(mode, writers, iterations):
+    tmpdir=tempfile.mkdtemp()
+    database.DB_NAME=os.path.join(tmpdir, f"bench_{mode}.db")
+    database.create_db_if_not_exists()
+    # WAL dans les deux modes : on ne mesure que l'effet de la file d'écriture
+    conn=database.get_db_connection()
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+    bin_ids=[database.get_or_create_bin(bn) for bn in BINS]
+    submit=direct_submit if mode=="direct" else queue_submit
+    if mode=="queue":
+        database.WRITER.stats.update(batches=0, jobs=0)
+
+    counts={"ok":0,"locked":0,"other":0}
+    lock=threading.Lock()
+    start_barrier=threading.Barrier(writers)
+
+    def attempt(fn, *args):
+        try:
+            res=submit(fn, *args)
+            key="ok"
+        except sqlite3.OperationalError as e:
+            res=None
+            key="locked" if "locked" in str(e) else "other"
+        with lock:
+            counts[key]+=1
+        return res
+
+    def worker(n):
+        rnd=random.Random(n)
+        start_barrier.wait()
+        for i in range(iterations):
+            bin_id=rnd.choice(bin_ids)
+            art_id=attempt(database._add_article, bin_id, f"ART{n}-{i}", "ref", f"w{n}", rnd.randint(1,20))
+            if art_id is None:
+                continue
+            attempt(database._edit_article, art_id, "ref2", rnd.randint(1,20), f"w{n}")
+            attempt(database._remove_article, art_id)
+
+    threads=[threading.Thread(target=worker, args=(n,)) for n in range(writers)]
+    t0=time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed=time.perf_counter()-t0
+
+    issues=database.reconcile_ledger()
+    line=(f"{mode:>6} : {counts['ok']} écritures OK en {elapsed:.2f}s "
+          f"=> {counts['ok']/elapsed:.0f} écritures/s, "
+          f"erreurs 'database is locked' : {counts['locked']}, autres : {counts['other']}, "
+          f"écarts journal : {len(issues)}")
+    if mode=="queue":
+        stats=database.WRITER.stats
+        line+=f", {stats['batches']} COMMIT (lots de {stats['jobs']/max(stats['batches'],1):.1f} en moyenne)"
+    print(line)
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--mode", choices=["direct","queue","both"], default="both")
+    args=parser.parse_args()
+    modes=["direct","queue"] if args.mode=="both" else [args.mode]
+    for mode in modes:
+        run(mode, args.writers, args.iterations)
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,122 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:  # optionnel : sans le paquet "brotli", on ne fait que du gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/html", "application/json")
+
+class CompressionMiddleware:
+    """
+    Middleware WSGI : compresse (br ou gzip) les réponses HTML/JSON
+    au-delà de min_size octets, si le client l'accepte.
+    Les autres réponses (fichiers, images, export Excel) passent telles quelles.
+    """
+
+    def __init__(self, app, min_size=1024, gzip_level=6, brotli_quality=5):
+        self.app=app
+        self.min_size=min_size
+        self.gzip_level=gzip_level
+        self.brotli_quality=brotli_quality
+
+    @staticmethod
+    def parse_accept_encoding(accept_encoding):
+        """
+        {codage: q} ; q absent => 1, q illisible => 0 (codage ignoré).
+        """
+        prefs={}
+        for part in accept_encoding.lower().split(","):
+            name,_,params=part.partition(";")
+            name=name.strip()
+            if not name:
+                continue
+            q=1.0
+            for param in params.split(";"):
+                key,_,val=param.partition("=")
+                if key.strip()=="q":
+                    try:
+                        q=float(val.strip())
+                    except ValueError:
+                        q=0.0
+            prefs[name]=q
+        return prefs
+
+    def choose_encoding(self, accept_encoding):
+        """
+        Codage au q le plus élevé (br prioritaire à égalité), None si
+        aucun n'est accepté (q=0 => refusé, "*" couvre les non cités).
+        """
+        prefs=self.parse_accept_encoding(accept_encoding)
+        candidates=["br","gzip"] if brotli is not None else ["gzip"]
+        def quality(enc):
+            return prefs.get(enc, prefs.get("*", 0.0))
+        best=max(candidates, key=quality)
+        return best if quality(best)>0 else None
+
+    def compress(self, body, encoding):
+        if encoding=="br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    @staticmethod
+    def is_compressible(status, headers):
+        if not status.startswith("200"):
+            return False
+        names={k.lower():v for k,v in headers}
+        if "content-encoding" in names:
+            return False
+        ctype=names.get("content-type","").split(";")[0].strip().lower()
+        return ctype in COMPRESSIBLE_TYPES
+
+    @staticmethod
+    def with_vary(headers):
+        """
+        Ajoute Vary: Accept-Encoding sauf s'il y est déjà
+        (posé par app.conditional_html, pour que les 304 l'aient aussi).
+        """
+        for k,v in headers:
+            if k.lower()=="vary" and "accept-encoding" in v.lower():
+                return list(headers)
+        return list(headers)+[("Vary","Accept-Encoding")]
+
+    def __call__(self, environ, start_response):
+        encoding=self.choose_encoding(environ.get("HTTP_ACCEPT_ENCODING",""))
+        # HEAD : pas de corps à compresser, on garde le Content-Length d'origine
+        if encoding is None or environ.get("REQUEST_METHOD")=="HEAD":
+            def vary_start_response(status, headers, exc_info=None):
+                if self.is_compressible(status, headers):
+                    headers=self.with_vary(headers)
+                return start_response(status, headers, exc_info)
+            return self.app(environ, vary_start_response)
+
+        captured={}
+        chunks=[]
+
+        def buffered_start_response(status, headers, exc_info=None):
+            if "returned" not in captured and self.is_compressible(status, headers):
+                captured["status"]=status
+                captured["headers"]=headers
+                return chunks.append
+            return start_response(status, headers, exc_info)
+
+        app_iter=self.app(environ, buffered_start_response)
+        if "status" not in captured:
+            captured["returned"]=True
+            return app_iter
+
+        try:
+            for chunk in app_iter:
+                chunks.append(chunk)
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+        body=b"".join(chunks)
+
+        headers=self.with_vary([(k,v) for k,v in captured["headers"] if k.lower()!="content-length"])
+        if len(body)>=self.min_size:
+            body=self.compress(body, encoding)
+            headers.append(("Content-Encoding",encoding))
+        headers.append(("Content-Length",str(len(body))))
+        start_response(captured["status"], headers)
+        return [body]
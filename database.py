@@ -1,73 +1,58 @@
 import sqlite3
 import os
-import openpyxl
+import json
 from datetime import datetime
 from collections import defaultdict
+from write_queue import WriteQueue
+from migrations import run_migrations
 
 DB_NAME = "pallets.db"
 
+# Un checkpoint (photo compacte de Articles) tous les N mouvements
+CHECKPOINT_INTERVAL = 200
+
 def get_db_connection():
     return sqlite3.connect(DB_NAME)
 
+def flush_metrics(c, totals):
+    """
+    Une seule maj de la ligne Metrics (id=1) par lot d'écritures.
+    """
+    c.execute("""UPDATE Metrics SET articles_in=articles_in+?, articles_out=articles_out+?
+                 WHERE id=1""", (totals["in"], totals["out"]))
+
+# Toutes les mutations d'articles / poids passent par ce thread écrivain
+WRITER = WriteQueue(get_db_connection, on_batch_end=flush_metrics)
+
 def create_db_if_not_exists():
     """
-    Crée la base Pallets / Articles / Movements / Metrics 
-    sans notion de threshold, etc.
-    """
-    first_creation = not os.path.exists(DB_NAME)
-    with get_db_connection() as conn:
-        c = conn.cursor()
-
-        # Pallets
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS Pallets (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                bin_name TEXT UNIQUE NOT NULL,
-                weight REAL DEFAULT 0,
-                image_path TEXT DEFAULT NULL
-            )
-        """)
-
-        # Articles
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS Articles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                bin_id INTEGER NOT NULL,
-                code TEXT NOT NULL,
-                reference TEXT,
-                login TEXT,
-                quantity INTEGER DEFAULT 1,
-                FOREIGN KEY(bin_id) REFERENCES Pallets(id)
-            )
-        """)
-
-        # Metrics (pour top 5, etc.)
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS Metrics (
-                id INTEGER PRIMARY KEY,
-                articles_in INTEGER DEFAULT 0,
-                articles_out INTEGER DEFAULT 0
-            )
-        """)
-        c.execute("SELECT id FROM Metrics WHERE id=1")
-        if not c.fetchone():
-            c.execute("INSERT INTO Metrics(id, articles_in, articles_out) VALUES(1,0,0)")
-
-        # Movements
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS Movements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                article_id INTEGER,
-                bin_id INTEGER,
-                action TEXT,   -- 'IN' ou 'OUT'
-                qty_change INTEGER DEFAULT 0, 
-                date_time TEXT,
-                FOREIGN KEY(article_id) REFERENCES Articles(id),
-                FOREIGN KEY(bin_id) REFERENCES Pallets(id)
-            )
-        """)
+    Crée / met à niveau la base (Pallets / Articles / Movements / Metrics ...)
+    via les migrations numérotées de migrations.py (PRAGMA user_version).
+    """
+    conn=get_db_connection()
+    try:
+        return run_migrations(conn)
+    finally:
+        conn.close()
 
-        conn.commit()
+def bump_zone_version(c, bin_id):
+    """
+    Incrémente la version de la zone du bin (dans la transaction en cours).
+    """
+    c.execute("""INSERT INTO ZoneVersions(letter, version)
+                 SELECT substr(bin_name,1,1), 1 FROM Pallets WHERE id=?
+                 ON CONFLICT(letter) DO UPDATE SET version=version+1""", (bin_id,))
+
+def get_zone_versions():
+    """
+    {lettre: version} ; une zone jamais modifiée est absente (=> 0).
+    """
+    conn=get_db_connection()
+    c=conn.cursor()
+    c.execute("SELECT letter, version FROM ZoneVersions")
+    rows=dict(c.fetchall())
+    conn.close()
+    return rows
 
 def get_or_create_bin(bin_name):
     conn=get_db_connection()
@@ -101,20 +86,30 @@ def get_bin_weight(bin_name):
         return row[0]
     return 0
 
+def _update_bin_weight(c, counters, bin_id, new_weight):
+    c.execute("UPDATE Pallets SET weight=? WHERE id=?", (new_weight, bin_id))
+    bump_zone_version(c, bin_id)
+
 def update_bin_weight(bin_id, new_weight):
     """
     Met à jour le weight dans Pallets (sans générer de mouvement).
     """
-    conn=get_db_connection()
-    c=conn.cursor()
     try:
-        c.execute("UPDATE Pallets SET weight=? WHERE id=?", (new_weight, bin_id))
-        conn.commit()
+        WRITER.submit(_update_bin_weight, bin_id, new_weight)
         return True, ""
     except Exception as e:
         return False, str(e)
-    finally:
-        conn.close()
+
+def get_article(article_id):
+    """
+    (bin_id, code, reference, login, quantity) ou None.
+    """
+    conn=get_db_connection()
+    c=conn.cursor()
+    c.execute("SELECT bin_id, code, reference, login, quantity FROM Articles WHERE id=?", (article_id,))
+    row=c.fetchone()
+    conn.close()
+    return row
 
 def list_articles_in_bin(bin_id):
     """
@@ -127,57 +122,58 @@ def list_articles_in_bin(bin_id):
     conn.close()
     return rows
 
-def add_article(bin_id, code, reference, login, quantity):
+def log_movement(c, article_id, bin_id, code, action, qty):
     """
-    Ajoute un article => metrics.in++ => Movements(action='IN', qty_change=quantity).
-    Si le bin était vide (0 article), on force l'utilisateur (ou on peut forcer le code) 
-    à mettre un weight. (Ici, on ne le fait pas automatiquement, 
-    juste on peut le signaler dans app.py)
+    Insère un mouvement dans le journal (à appeler APRÈS la maj de Articles,
+    dans la même transaction). Tous les CHECKPOINT_INTERVAL mouvements,
+    on enregistre un checkpoint de Articles pour accélérer le replay.
     """
-    conn=get_db_connection()
-    c=conn.cursor()
+    now_str=datetime.now().isoformat()
+    c.execute("""INSERT INTO Movements(article_id, bin_id, action, qty_change, date_time, code)
+                 VALUES(?,?,?,?,?,?)""",
+              (article_id, bin_id, action, qty, now_str, code))
+    mv_id=c.lastrowid
+    if mv_id % CHECKPOINT_INTERVAL == 0:
+        write_checkpoint(c, mv_id, now_str)
+    return mv_id
+
+def _add_article(c, counters, bin_id, code, reference, login, quantity):
     c.execute("""INSERT INTO Articles(bin_id, code, reference, login, quantity)
                  VALUES(?,?,?,?,?)""",
               (bin_id, code, reference, login, quantity))
     art_id=c.lastrowid
 
-    # maj metrics
-    c.execute("UPDATE Metrics SET articles_in=articles_in+? WHERE id=1", (quantity,))
-
-    now_str=datetime.now().isoformat()
-    c.execute("""INSERT INTO Movements(article_id, bin_id, action, qty_change, date_time)
-                 VALUES(?,?,?,?,?)""",
-              (art_id, bin_id, 'IN', quantity, now_str))
+    # maj metrics (cumulée sur le lot, voir flush_metrics)
+    counters["in"]+=quantity
 
-    conn.commit()
-    conn.close()
+    log_movement(c, art_id, bin_id, code, 'IN', quantity)
+    bump_zone_version(c, bin_id)
+    return art_id
 
-def remove_article(article_id):
+def add_article(bin_id, code, reference, login, quantity):
     """
-    Supprime un article => on considère tout son quantity comme un 'OUT'.
-    S'il n'y a plus d'articles => bin.weight=0
+    Ajoute un article => metrics.in++ => Movements(action='IN', qty_change=quantity).
+    Si le bin était vide (0 article), on force l'utilisateur (ou on peut forcer le code) 
+    à mettre un weight. (Ici, on ne le fait pas automatiquement, 
+    juste on peut le signaler dans app.py)
     """
-    conn=get_db_connection()
-    c=conn.cursor()
+    return WRITER.submit(_add_article, bin_id, code, reference, login, quantity)
 
-    c.execute("SELECT bin_id, quantity FROM Articles WHERE id=?", (article_id,))
+def _remove_article(c, counters, article_id):
+    c.execute("SELECT bin_id, quantity, code FROM Articles WHERE id=?", (article_id,))
     row=c.fetchone()
     if not row:
-        conn.close()
         return
-    bin_id, old_qty = row[0], row[1]
+    bin_id, old_qty, code = row[0], row[1], row[2]
 
     # delete l'article
     c.execute("DELETE FROM Articles WHERE id=?", (article_id,))
 
     # maj metrics => articles_out += old_qty
-    c.execute("UPDATE Metrics SET articles_out=articles_out+? WHERE id=1", (old_qty,))
+    counters["out"]+=old_qty
 
     # Movements => 'OUT' , qty_change= old_qty
-    now_str=datetime.now().isoformat()
-    c.execute("""INSERT INTO Movements(article_id, bin_id, action, qty_change, date_time)
-                 VALUES(?,?,?,?,?)""",
-              (article_id, bin_id, 'OUT', old_qty, now_str))
+    log_movement(c, article_id, bin_id, code, 'OUT', old_qty)
 
     # verif s'il reste des articles
     c.execute("SELECT COUNT(*) FROM Articles WHERE bin_id=?", (bin_id,))
@@ -185,26 +181,21 @@ def remove_article(article_id):
     if nb==0:
         # plus d'articles => weight=0
         c.execute("UPDATE Pallets SET weight=0 WHERE id=?", (bin_id,))
+    bump_zone_version(c, bin_id)
 
-    conn.commit()
-    conn.close()
-
-def edit_article(article_id, new_ref, new_qty, new_login):
+def remove_article(article_id):
     """
-    Modifie la reference, la qty, le login.
-    Compare new_qty vs old_qty => 
-      si new_qty>old_qty => difference = new_qty - old_qty => c'est un 'IN'
-      si new_qty<old_qty => difference = old_qty - new_qty => c'est un 'OUT'
-    Met à jour Metrics et Movements en conséquence.
+    Supprime un article => on considère tout son quantity comme un 'OUT'.
+    S'il n'y a plus d'articles => bin.weight=0
     """
-    conn=get_db_connection()
-    c=conn.cursor()
-    c.execute("SELECT bin_id, quantity FROM Articles WHERE id=?", (article_id,))
+    WRITER.submit(_remove_article, article_id)
+
+def _edit_article(c, counters, article_id, new_ref, new_qty, new_login):
+    c.execute("SELECT bin_id, quantity, code FROM Articles WHERE id=?", (article_id,))
     row=c.fetchone()
     if not row:
-        conn.close()
         return
-    bin_id, old_qty=row[0], row[1]
+    bin_id, old_qty, code=row[0], row[1], row[2]
 
     diff=new_qty - old_qty
     # maj de l'article
@@ -213,23 +204,25 @@ def edit_article(article_id, new_ref, new_qty, new_login):
                  WHERE id=?""",
               (new_ref, new_qty, new_login, article_id))
 
-    now_str=datetime.now().isoformat()
     if diff>0:
         # c'est un IN partiel
-        c.execute("UPDATE Metrics SET articles_in=articles_in+? WHERE id=1", (diff,))
-        c.execute("""INSERT INTO Movements(article_id, bin_id, action, qty_change, date_time)
-                     VALUES(?,?,?,?,?)""",
-                  (article_id, bin_id, 'IN', diff, now_str))
+        counters["in"]+=diff
+        log_movement(c, article_id, bin_id, code, 'IN', diff)
     elif diff<0:
         # c'est un OUT partiel
         out_qty = abs(diff)
-        c.execute("UPDATE Metrics SET articles_out=articles_out+? WHERE id=1", (out_qty,))
-        c.execute("""INSERT INTO Movements(article_id, bin_id, action, qty_change, date_time)
-                     VALUES(?,?,?,?,?)""",
-                  (article_id, bin_id, 'OUT', out_qty, now_str))
+        counters["out"]+=out_qty
+        log_movement(c, article_id, bin_id, code, 'OUT', out_qty)
 
-    conn.commit()
-    conn.close()
+def edit_article(article_id, new_ref, new_qty, new_login):
+    """
+    Modifie la reference, la qty, le login.
+    Compare new_qty vs old_qty => 
+      si new_qty>old_qty => difference = new_qty - old_qty => c'est un 'IN'
+      si new_qty<old_qty => difference = old_qty - new_qty => c'est un 'OUT'
+    Met à jour Metrics et Movements en conséquence.
+    """
+    WRITER.submit(_edit_article, article_id, new_ref, new_qty, new_login)
 
 def update_bin_image(bin_id, image_path):
     conn=get_db_connection()
@@ -265,6 +258,9 @@ def search_db(query):
     return ("ARTICLE", rows)
 
 def export_excel_xlsx():
+    # import tardif : openpyxl est lourd et seul /export_excel en a besoin
+    import openpyxl
+
     out_file="export.xlsx"
     conn=get_db_connection()
     c=conn.cursor()
@@ -332,6 +328,17 @@ def get_metrics():
     conn.close()
     return row if row else (0,0)
 
+def get_ledger_version():
+    """
+    Dernier id de Movements : change à chaque mouvement (clé de cache).
+    """
+    conn=get_db_connection()
+    c=conn.cursor()
+    c.execute("SELECT MAX(id) FROM Movements")
+    row=c.fetchone()
+    conn.close()
+    return row[0] or 0
+
 def get_movements_in_date_range(start_date, end_date):
     """
     Movements => (id, article_id, bin_id, action, qty_change, date_time)
@@ -425,3 +432,166 @@ def get_movements_by_article_in_range(start_date, end_date):
     rows=c.fetchall()
     conn.close()
     return rows
+
+def write_checkpoint(c, movement_id, date_time):
+    """
+    Photo compacte (JSON) de l'état rejoué depuis le journal, valable juste
+    après movement_id : checkpoint précédent + mouvements suivants.
+    On ne copie PAS Articles, sinon un écart de la table deviendrait
+    "l'historique" pour toutes les requêtes suivantes.
+    """
+    state=_replay(c)
+    c.execute("""INSERT INTO Checkpoints(movement_id, date_time, state)
+                 VALUES(?,?,?)""",
+              (movement_id, date_time, json.dumps(state, separators=(",",":"))))
+
+def normalize_timestamp(ts):
+    """
+    'YYYY-MM-DD' => fin de journée, 'YYYY-MM-DDTHH:MM' => fin de la minute,
+    sinon ISO complet (comparable à date_time).
+    Lève ValueError si le format est invalide.
+    """
+    dt=datetime.fromisoformat(ts)
+    if len(ts)==10:
+        dt=dt.replace(hour=23, minute=59, second=59, microsecond=999999)
+    elif len(ts)==16:
+        dt=dt.replace(second=59, microsecond=999999)
+    return dt.isoformat()
+
+def _apply_movement(state, aid, bid, action, qty, code):
+    if action=='IN':
+        if aid in state:
+            state[aid][2]+=qty
+        else:
+            state[aid]=[bid,code,qty]
+    elif action=='OUT' and aid in state:
+        state[aid][2]-=qty
+        if state[aid][2]<=0:
+            del state[aid]
+
+def _fill_missing_codes(c, state):
+    # anciens mouvements sans code => on complète avec Articles si possible
+    missing=[aid for aid,v in state.items() if v[1] is None]
+    if missing:
+        c.execute("SELECT id, code FROM Articles WHERE id IN (%s)" % ",".join("?"*len(missing)), missing)
+        for aid,code in c.fetchall():
+            state[aid][1]=code
+
+def _replay(c, at=None):
+    """
+    Reconstruit {article_id: [bin_id, code, quantity]} à l'instant `at`
+    (None => tout le journal) : on part du checkpoint le plus proche
+    puis on rejoue uniquement les mouvements suivants.
+    """
+    if at is None:
+        c.execute("SELECT movement_id, state FROM Checkpoints ORDER BY movement_id DESC LIMIT 1")
+    else:
+        c.execute("""SELECT movement_id, state FROM Checkpoints
+                     WHERE date_time<=? ORDER BY movement_id DESC LIMIT 1""", (at,))
+    row=c.fetchone()
+    if row:
+        last_id=row[0]
+        state={int(k):v for k,v in json.loads(row[1]).items()}
+    else:
+        last_id=0
+        state={}
+
+    if at is None:
+        c.execute("""SELECT article_id, bin_id, action, qty_change, code
+                     FROM Movements WHERE id>? ORDER BY id ASC""", (last_id,))
+    else:
+        c.execute("""SELECT article_id, bin_id, action, qty_change, code
+                     FROM Movements WHERE id>? AND date_time<=? ORDER BY id ASC""", (last_id, at))
+    for mv in c.fetchall():
+        _apply_movement(state, *mv)
+
+    _fill_missing_codes(c, state)
+    return state
+
+def _replay_full(c):
+    """
+    Rejoue TOUT le journal depuis le début, sans faire confiance aux
+    checkpoints : chacun est comparé à l'état rejoué à son movement_id.
+    Retourne (state, écarts des checkpoints).
+    """
+    c.execute("SELECT id, movement_id, state FROM Checkpoints ORDER BY movement_id ASC")
+    checkpoints=c.fetchall()
+    c.execute("""SELECT id, article_id, bin_id, action, qty_change, code
+                 FROM Movements ORDER BY id ASC""")
+    movements=c.fetchall()
+
+    state={}
+    issues=[]
+    pos=0
+    for (cp_id,cp_mv,cp_state) in checkpoints:
+        while pos<len(movements) and movements[pos][0]<=cp_mv:
+            _apply_movement(state, *movements[pos][1:])
+            pos+=1
+        stored={int(k):(v[0],v[2]) for k,v in json.loads(cp_state).items()}
+        for aid in sorted(set(stored)|set(state)):
+            expected=(state[aid][0],state[aid][2]) if aid in state else None
+            if stored.get(aid)!=expected:
+                issues.append((f"CHECKPOINT#{cp_id}", aid,
+                               expected[1] if expected else None,
+                               stored[aid][1] if aid in stored else None))
+    for mv in movements[pos:]:
+        _apply_movement(state, *mv[1:])
+    _fill_missing_codes(c, state)
+    return state, issues
+
+def get_inventory_at(at, bin_name=None):
+    """
+    État du palettier à l'instant `at` (ISO) reconstruit depuis Movements.
+    Retourne {bin_name: [(article_id, code, quantity), ...]},
+    limité à un seul bin si bin_name est fourni.
+    Le poids des bins n'est pas journalisé : il n'est pas reconstruit.
+    """
+    conn=get_db_connection()
+    c=conn.cursor()
+    state=_replay(c, normalize_timestamp(at))
+    c.execute("SELECT id, bin_name FROM Pallets")
+    names=dict(c.fetchall())
+    conn.close()
+
+    result=defaultdict(list)
+    for aid,(bid,code,qty) in sorted(state.items()):
+        bn=names.get(bid, "??")
+        if bin_name and bn!=bin_name:
+            continue
+        result[bn].append((aid, code or "?", qty))
+    return dict(sorted(result.items()))
+
+def reconcile_ledger():
+    """
+    Compare le journal rejoué en entier avec Articles, Metrics et les
+    checkpoints. Retourne une liste de (type, article_id, attendu_journal, actuel) ;
+    liste vide => tout est cohérent.
+    """
+    conn=get_db_connection()
+    c=conn.cursor()
+    state,issues=_replay_full(c)
+    c.execute("SELECT id, bin_id, quantity FROM Articles")
+    current={aid:(bid,qty) for (aid,bid,qty) in c.fetchall()}
+    c.execute("""SELECT
+                   COALESCE(SUM(CASE WHEN action='IN' THEN qty_change END),0),
+                   COALESCE(SUM(CASE WHEN action='OUT' THEN qty_change END),0)
+                 FROM Movements""")
+    ledger_in,ledger_out=c.fetchone()
+    c.execute("SELECT articles_in, articles_out FROM Metrics WHERE id=1")
+    metrics=c.fetchone() or (0,0)
+    conn.close()
+
+    for aid in sorted(set(state)|set(current)):
+        if aid not in current:
+            issues.append(("ABSENT_ARTICLES", aid, state[aid][2], None))
+        elif aid not in state:
+            issues.append(("ABSENT_JOURNAL", aid, None, current[aid][1]))
+        elif state[aid][2]!=current[aid][1]:
+            issues.append(("QUANTITE", aid, state[aid][2], current[aid][1]))
+        elif state[aid][0]!=current[aid][0]:
+            issues.append(("BIN", aid, state[aid][0], current[aid][0]))
+    if ledger_in!=metrics[0]:
+        issues.append(("METRICS_IN", None, ledger_in, metrics[0]))
+    if ledger_out!=metrics[1]:
+        issues.append(("METRICS_OUT", None, ledger_out, metrics[1]))
+    return issues
@@ -0,0 +1,110 @@
+# Migrations du schéma, appliquées dans l'ordre au démarrage.
+# PRAGMA user_version = numéro de la dernière migration appliquée.
+# Les bases créées avant ce système (user_version=0) ont déjà tout ou
+# partie du schéma : chaque migration doit donc rester idempotente.
+
+def migration_001_base(c):
+    # Pallets
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS Pallets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bin_name TEXT UNIQUE NOT NULL,
+            weight REAL DEFAULT 0,
+            image_path TEXT DEFAULT NULL
+        )
+    """)
+
+    # Articles
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS Articles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bin_id INTEGER NOT NULL,
+            code TEXT NOT NULL,
+            reference TEXT,
+            login TEXT,
+            quantity INTEGER DEFAULT 1,
+            FOREIGN KEY(bin_id) REFERENCES Pallets(id)
+        )
+    """)
+
+    # Metrics (pour top 5, etc.)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS Metrics (
+            id INTEGER PRIMARY KEY,
+            articles_in INTEGER DEFAULT 0,
+            articles_out INTEGER DEFAULT 0
+        )
+    """)
+    c.execute("SELECT id FROM Metrics WHERE id=1")
+    if not c.fetchone():
+        c.execute("INSERT INTO Metrics(id, articles_in, articles_out) VALUES(1,0,0)")
+
+    # Movements
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS Movements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            article_id INTEGER,
+            bin_id INTEGER,
+            action TEXT,   -- 'IN' ou 'OUT'
+            qty_change INTEGER DEFAULT 0, 
+            date_time TEXT,
+            FOREIGN KEY(article_id) REFERENCES Articles(id),
+            FOREIGN KEY(bin_id) REFERENCES Pallets(id)
+        )
+    """)
+
+def migration_002_ledger_replay(c):
+    # code de l'article dans le journal (pour rejouer même après suppression)
+    c.execute("PRAGMA table_info(Movements)")
+    if "code" not in [col[1] for col in c.fetchall()]:
+        c.execute("ALTER TABLE Movements ADD COLUMN code TEXT")
+
+    # Checkpoints : état de Articles après le mouvement movement_id
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS Checkpoints (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            movement_id INTEGER NOT NULL,
+            date_time TEXT NOT NULL,
+            state TEXT NOT NULL   -- JSON {article_id: [bin_id, code, quantity]}
+        )
+    """)
+
+def migration_003_zone_versions(c):
+    # Versions par zone (lettre) => invalide le cache HTML de l'accueil
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS ZoneVersions (
+            letter TEXT PRIMARY KEY,
+            version INTEGER DEFAULT 0
+        )
+    """)
+
+MIGRATIONS = [
+    migration_001_base,
+    migration_002_ledger_replay,
+    migration_003_zone_versions,
+]
+
+def run_migrations(conn):
+    """
+    Applique les migrations manquantes dans une seule transaction
+    BEGIN IMMEDIATE (deux workers qui démarrent ensemble ne migrent
+    pas deux fois). Retourne la liste des numéros appliqués.
+    """
+    conn.isolation_level=None
+    c=conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        c.execute("PRAGMA user_version")
+        current=c.fetchone()[0]
+        applied=[]
+        for version,migration in enumerate(MIGRATIONS, start=1):
+            if version<=current:
+                continue
+            migration(c)
+            c.execute(f"PRAGMA user_version={version}")
+            applied.append(version)
+        c.execute("COMMIT")
+    except Exception:
+        c.execute("ROLLBACK")
+        raise
+    return applied
@@ -0,0 +1,101 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database import (
+    get_total_articles, get_metrics, get_top_5_in, get_top_5_out,
+    get_movements_in_date_range, get_articles_in_multiple_bins,
+    get_movements_by_article_in_range, get_ledger_version
+)
+
+# Panneaux du dashboard, chacun servi en JSON (/dashboard/panel/<nom>).
+# Cache par panneau, clé = (nom, dates) et valeur valide tant que la
+# version du journal (MAX(Movements.id)) n'a pas bougé.
+PANEL_CACHE={}
+PANEL_CACHE_MAX=64   # plafond (plages de dates différentes), les plus anciennes sortent
+PANEL_STATS={"hits":0,"misses":0}
+panels_lock=threading.Lock()
+PANEL_EXECUTOR=ThreadPoolExecutor(max_workers=4, thread_name_prefix="dashboard")
+
+def panel_totals(start_date, end_date):
+    articles_in,articles_out=get_metrics()
+    return {
+        "total_articles":get_total_articles(),
+        "articles_in":articles_in,
+        "articles_out":articles_out
+    }
+
+def panel_top5_in(start_date, end_date):
+    return [list(r) for r in get_top_5_in()]
+
+def panel_top5_out(start_date, end_date):
+    return [list(r) for r in get_top_5_out()]
+
+def date_bounds(start_date, end_date):
+    """
+    Date vide => borne ouverte (début / fin du journal).
+    """
+    return start_date or "", end_date or "9999-12-31"
+
+def panel_flux(start_date, end_date):
+    moves=get_movements_in_date_range(*date_bounds(start_date,end_date))
+    flux_by_day={}
+    for mv in moves:
+        # mv = (id, article_id, bin_id, action, qty_change, date_time)
+        dt=mv[5][:10]
+        flux_by_day[dt]=flux_by_day.get(dt,0)+1
+    sorted_days=sorted(flux_by_day.keys())
+    return {"labels":sorted_days, "values":[flux_by_day[d] for d in sorted_days]}
+
+def panel_usage(start_date, end_date):
+    usage_list=get_movements_by_article_in_range(*date_bounds(start_date,end_date))
+    return {"labels":[u[0] for u in usage_list], "values":[u[1] for u in usage_list]}
+
+def panel_duplicates(start_date, end_date):
+    return [[code, binlist] for code,binlist in get_articles_in_multiple_bins()]
+
+# nom => (fonction, dépend de la période ?)
+PANELS={
+    "totals":(panel_totals, False),
+    "top5_in":(panel_top5_in, False),
+    "top5_out":(panel_top5_out, False),
+    "flux":(panel_flux, True),
+    "usage":(panel_usage, True),
+    "duplicates":(panel_duplicates, False),
+}
+
+def get_panel(name, start_date, end_date, version=None):
+    """
+    Données d'un panneau (depuis le cache si le journal n'a pas changé).
+    Lève KeyError si le panneau n'existe pas.
+    """
+    fn,uses_dates=PANELS[name]
+    key=(name, start_date, end_date) if uses_dates else (name,)
+    if version is None:
+        version=get_ledger_version()
+
+    cached=PANEL_CACHE.get(key)
+    if cached and cached[0]==version:
+        with panels_lock:
+            PANEL_STATS["hits"]+=1
+        return cached[1]
+
+    data=fn(start_date, end_date)
+    with panels_lock:
+        PANEL_STATS["misses"]+=1
+        # les entrées d'une version dépassée ne resserviront plus
+        for old_key in [k for k,(v,_) in PANEL_CACHE.items() if v<version]:
+            del PANEL_CACHE[old_key]
+        PANEL_CACHE.pop(key, None)
+        PANEL_CACHE[key]=(version,data)
+        while len(PANEL_CACHE)>PANEL_CACHE_MAX:
+            del PANEL_CACHE[next(iter(PANEL_CACHE))]
+    return data
+
+def get_all_panels(start_date, end_date):
+    """
+    Tous les panneaux, calculés en parallèle dans PANEL_EXECUTOR.
+    """
+    version=get_ledger_version()
+    futures={name:PANEL_EXECUTOR.submit(get_panel, name, start_date, end_date, version)
+             for name in PANELS}
+    return {name:fut.result() for name,fut in futures.items()}
@@ -0,0 +1,120 @@
+import queue
+import threading
+from collections import defaultdict
+
+class WriteJob:
+    def __init__(self, fn, args):
+        self.fn=fn
+        self.args=args
+        self.result=None
+        self.error=None
+        self.done=threading.Event()
+
+class WriteQueue:
+    """
+    Un seul thread écrivain par process : les écritures concurrentes sont
+    mises en file puis regroupées en courtes transactions BEGIN IMMEDIATE
+    (plus d'upgrade de verrou SHARED => RESERVED qui échoue en "database is locked").
+
+    Chaque job est une fonction fn(c, counters, *args) exécutée dans un
+    SAVEPOINT : un job en erreur est annulé sans faire échouer le lot.
+    Les compteurs (counters[...] += n) sont cumulés sur le lot puis
+    passés à on_batch_end(c, totals) avant le COMMIT.
+    """
+
+    def __init__(self, connect, on_batch_end=None, max_batch=64):
+        self.connect=connect
+        self.on_batch_end=on_batch_end
+        self.max_batch=max_batch
+        self.jobs=queue.Queue()
+        self.thread=None
+        self.start_lock=threading.Lock()
+        self.stats={"batches":0,"jobs":0}
+
+    def submit(self, fn, *args):
+        """
+        Exécute fn dans le thread écrivain et attend le COMMIT du lot.
+        Relance l'exception du job s'il a échoué.
+        """
+        self._ensure_started()
+        job=WriteJob(fn, args)
+        self.jobs.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _ensure_started(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.start_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread=threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self.thread.start()
+
+    def _next_batch(self):
+        batch=[self.jobs.get()]
+        while len(batch)<self.max_batch:
+            try:
+                batch.append(self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _open(self):
+        conn=self.connect()
+        conn.isolation_level=None  # transactions gérées à la main
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _run(self):
+        conn=None
+        while True:
+            batch=self._next_batch()
+            try:
+                if conn is None:
+                    conn=self._open()
+                self._run_batch(conn, batch)
+            except Exception as e:
+                for job in batch:
+                    job.result=None
+                    if job.error is None:
+                        job.error=e
+                if conn is not None:
+                    # connexion peut-être inutilisable : on la jette (sans laisser
+                    # une erreur de ROLLBACK tuer le thread), une neuve sera ouverte
+                    try:
+                        if conn.in_transaction:
+                            conn.execute("ROLLBACK")
+                    except Exception:
+                        pass
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                    conn=None
+            finally:
+                self.stats["batches"]+=1
+                self.stats["jobs"]+=len(batch)
+                for job in batch:
+                    job.done.set()
+
+    def _run_batch(self, conn, batch):
+        c=conn.cursor()
+        c.execute("BEGIN IMMEDIATE")
+        totals=defaultdict(int)
+        for job in batch:
+            counters=defaultdict(int)
+            c.execute("SAVEPOINT job")
+            try:
+                job.result=job.fn(c, counters, *job.args)
+            except Exception as e:
+                job.error=e
+                c.execute("ROLLBACK TO job")
+            else:
+                for key,val in counters.items():
+                    totals[key]+=val
+            c.execute("RELEASE job")
+        if self.on_batch_end is not None and totals:
+            self.on_batch_end(c, totals)
+        c.execute("COMMIT")